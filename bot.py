@@ -1,7 +1,12 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 import base64
 import logging
 import hashlib
+import io
+import os
+import signal
 import time
 from typing import List, Optional
 from zoneinfo import ZoneInfo
@@ -10,21 +15,47 @@ import discord
 from discord.ext import tasks
 import requests
 from ts3API.utilities import TS3ConnectionClosedException
-from config import Config
+from config import Config, TS3_CONNECTION_FIELDS
 from domain import ServerInfo
+from embeds import IMAGE_FILENAME, build_image_embed, build_text_embed
 from i18n import get_translator
+from http_server import SnapshotServer
 from image import generate_status_image
+from leader import LeaderLock
+from state import load_message_ids, save_message_ids
 from teamspeak import Teamspeak
+from loop_monitor import LoopLagMonitor
+from webhook import WebhookPool
 
 logger = logging.getLogger(__name__)
 
+CONFIG_WATCH_INTERVAL = 5
+PRESENCE_MIN_INTERVAL = 15
+RESTART_REQUIRED_FIELDS = ('discord_token', 'ha_lock_file', 'http_host', 'http_port', 'record_file', 'record_max_bytes', 'record_backup_count', 'loop_lag_threshold', 'discord_webhook_urls')
+
 class Bot:
     def __init__(self, config: Config):
         self.config = config
-        self.message_ids: dict = {}
+        self.message_ids: dict = load_message_ids(config.state_file) if config.state_file else {}
+        self.config_mtime: Optional[float] = self.get_config_mtime()
+        self.leader: Optional[LeaderLock] = LeaderLock(config.ha_lock_file) if config.ha_lock_file else None
+        self.snapshot_server: Optional[SnapshotServer] = SnapshotServer(config.http_host, config.http_port) if config.http_port else None
+        self.lag_monitor: Optional[LoopLagMonitor] = LoopLagMonitor(config.loop_lag_threshold) if config.loop_lag_threshold > 0 else None
+        if self.snapshot_server is not None and self.lag_monitor is not None:
+            self.snapshot_server.add_json_route("/loop-lag.json", self.lag_monitor.percentiles)
+
+        self.presence_text: Optional[str] = None
+        self.pending_presence_text: Optional[str] = None
+        self.presence_updated_at: float = 0.0
+        self.presence_task: Optional[asyncio.Task] = None
+
+        self.webhooks: Optional[WebhookPool] = WebhookPool(config.discord_webhook_urls) if config.discord_webhook_urls else None
+        self.closed = asyncio.Event()
 
         self.bot = discord.Client(intents=discord.Intents.default())
         self.teamspeak: Teamspeak = Teamspeak(config)
+        # Polls get their own thread, so one stuck on the server can't hold up the renders in the default executor
+        self.teamspeak_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="teamspeak")
 
         self.setup_events()
 
@@ -32,89 +63,137 @@ class Bot:
         @self.bot.event
         async def on_ready():
             logger.info(f'Bot logged in as {self.bot.user}')
-            self.teamspeak.connect()
+            await self.start_services()
+
+    async def start_services(self):
+        if not self.update_status.is_running():
+            # The first cycle connects to TeamSpeak, off the event loop
+            if self.leader is not None and not self.leader.try_acquire():
+                logger.info("Another replica holds the leader lock, starting as standby")
             self.update_status.start()
 
-            self.update_status.change_interval(
-                seconds=self.config.update_interval)
+        if self.snapshot_server is not None and self.snapshot_server.runner is None:
+            await self.snapshot_server.start()
 
-    def create_embed(self, server_info: ServerInfo) -> tuple[discord.Embed, Optional[discord.File]]:
-        if self.config.use_image_embed:
-            return self.create_image_embed(server_info)
-        else:
-            return self.create_textual_embed(server_info), None
+        if self.leader is not None and not self.leader_election.is_running():
+            self.leader_election.change_interval(seconds=self.config.ha_poll_interval)
+            self.leader_election.start()
+
+        self.update_status.change_interval(
+            seconds=self.config.update_interval)
+
+        if self.config.config_file and not self.watch_config_file.is_running():
+            self.watch_config_file.start()
+
+    def get_config_mtime(self) -> Optional[float]:
+        if not self.config.config_file:
+            return None
+        try:
+            return os.path.getmtime(self.config.config_file)
+        except OSError:
+            return None
 
-    def create_image_embed(self, server_info: ServerInfo) -> tuple[discord.Embed, Optional[discord.File]]:
-        img_buffer = None
+    def reload_config(self):
         try:
-            img_buffer = generate_status_image(server_info, self.config)
-            img_buffer.seek(0)
+            new_config = Config.load()
+        except Exception as e:
+            logger.error(f"Failed to reload config: {e}")
+            return
+
+        if not (new_config.discord_channel_ids or new_config.discord_webhook_urls) or not new_config.ts3_host:
+            logger.error("Reloaded config is missing DISCORD_CHANNEL_IDS or TS3_HOST, keeping the current config")
+            return
+
+        self.apply_config(new_config)
+
+    def apply_config(self, new_config: Config):
+        old_config = self.config
+        changed = old_config.diff(new_config)
+        if not changed:
+            logger.info("Config reloaded, nothing changed")
+            return
+
+        for name in RESTART_REQUIRED_FIELDS:
+            if name in changed:
+                logger.warning(f"{name.upper()} changes require a restart, ignoring")
+                setattr(new_config, name, getattr(old_config, name))
+                changed.discard(name)
+
+        self.config = new_config
+        self.teamspeak.config = new_config
 
-            file = discord.File(img_buffer, filename="status.png")
+        for id in set(old_config.discord_channel_ids) - set(new_config.discord_channel_ids):
+            self.message_ids.pop(id, None)
+
+        if 'update_interval' in changed:
+            self.update_status.change_interval(seconds=new_config.update_interval)
+
+        if 'ha_poll_interval' in changed and self.leader is not None:
+            self.leader_election.change_interval(seconds=new_config.ha_poll_interval)
+
+        if changed & TS3_CONNECTION_FIELDS and self.is_active:
+            # Reconnecting here would block the loop on the lock of an in-flight query,
+            # so the connection is dropped and the next poll reconnects off the loop
+            logger.info("TeamSpeak connection settings changed, reconnecting on the next poll")
+            self.teamspeak.abort()
+
+        logger.info(f"Config reloaded, changed: {', '.join(sorted(changed))}")
+
+    @tasks.loop(seconds=CONFIG_WATCH_INTERVAL)
+    async def watch_config_file(self):
+        mtime = self.get_config_mtime()
+        if mtime is not None and mtime != self.config_mtime:
+            self.config_mtime = mtime
+            self.reload_config()
+
+    @property
+    def is_active(self) -> bool:
+        return self.leader is None or self.leader.is_leader
+
+    @tasks.loop(seconds=5)
+    async def leader_election(self):
+        if self.leader.is_leader:
+            return
+
+        # Keep the message ids the leader persisted warm, so taking over edits them instead of purging
+        if self.config.state_file:
+            self.message_ids = load_message_ids(self.config.state_file)
+
+        if self.leader.try_acquire():
+            # Restarting the loop runs a cycle now without overlapping a scheduled one
+            logger.info("Became leader, taking over status updates")
+            self.update_status.restart()
+
+    def create_embed(self, server_info: ServerInfo, config: Optional[Config] = None) -> tuple[discord.Embed, Optional[bytes]]:
+        config = config or self.config
+        if config.use_image_embed:
+            return self.create_image_embed(server_info, config)
+        else:
+            return self.create_textual_embed(server_info, config), None
+
+    def create_image_embed(self, server_info: ServerInfo, config: Optional[Config] = None) -> tuple[discord.Embed, Optional[bytes]]:
+        config = config or self.config
+        try:
+            return discord.Embed.from_dict(build_image_embed()), self.render_image(server_info, config)
 
-            embed = discord.Embed(color=discord.Color.green())
-            embed.set_image(url="attachment://status.png")
-            
-            return embed, file
-            
         except Exception as e:
             logger.error(f"Failed to generate status image: {e}")
-            return self.create_textual_embed(server_info), None
-        finally:
-            if img_buffer is not None:
-                img_buffer.close()
+            return self.create_textual_embed(server_info, config), None
 
-    def create_textual_embed(self, server_info: ServerInfo) -> discord.Embed:
-        _t = get_translator(self.config)
+    @staticmethod
+    def create_attachment(image: Optional[bytes]) -> Optional[discord.File]:
+        # Every upload needs its own stream; a BytesIO over the shared bytes doesn't copy them
+        if image is None:
+            return None
+        return discord.File(io.BytesIO(image), filename=IMAGE_FILENAME)
 
-        if server_info.has_error:
-            embed = discord.Embed(
-                title=f"⚠️ {_t['server_unavailable']}",
-                description=f"{self.config.ts3_host}:{self.config.ts3_server_port}",
-                color=discord.Color.red()
-            )
-            embed.add_field(
-                name=_t["error"], value=server_info.errormsg, inline=False)
-        else:
-            embed = discord.Embed(
-                title=f"🎤 {server_info.name}",
-                color=discord.Color.green()
-            )
-
-            embed.add_field(
-                name=f"👨‍👨‍👦‍👦 {_t['users_online']}",
-                value=f"{server_info.online_users_count}/{server_info.max_clients}",
-                inline=True
-            )
-
-            embed.add_field(
-                name=f"⌚{_t['uptime']}",
-                value=f"{server_info.uptime_formatted}",
-                inline=True
-            )
-
-            if server_info.clients:
-                user_list = []
-                for client in server_info.clients:
-                    if client.idle_time_seconds < self.config.max_active_seconds:
-                        status_icon = "🟢"
-                    elif client.idle_time_seconds < self.config.max_away_seconds:
-                        status_icon = "🟡"
-                    else:
-                        status_icon = "🔴"
-
-                    user_list.append(
-                        f"{status_icon} **{client.nickname}** (*{client.idle_time_formatted}* {_t['ago']})")
-
-                embed.add_field(
-                    name=f"👥 {_t['users_header']}",
-                    value="\n".join(user_list) if user_list else _t["no_users"],
-                    inline=False
-                )
-
-        return embed
+    def create_textual_embed(self, server_info: ServerInfo, config: Optional[Config] = None) -> discord.Embed:
+        return discord.Embed.from_dict(build_text_embed(server_info, config or self.config))
 
     async def get_channels(self) -> List[Optional[discord.TextChannel]]:
+        if self.webhooks is not None:
+            return self.webhooks.channels
+
         channels = []
         for id in self.config.discord_channel_ids:
             channel = self.bot.get_channel(id)
@@ -127,6 +206,10 @@ class Bot:
         return channels
 
     async def get_voice_channels(self) -> List[Optional[discord.VoiceChannel]]:
+        # Renaming voice channels needs the gateway's channel cache
+        if self.webhooks is not None:
+            return []
+
         channels = []
         for id in getattr(self.config, "discord_voice_channel_ids", []):
             channel = self.bot.get_channel(id)
@@ -158,53 +241,181 @@ class Bot:
             except Exception as e:
                 logger.error(f"Failed to update channel name {channel.id}: {e}")
 
+    async def update_presence(self, server_info: ServerInfo):
+        _t = get_translator(self.config)
+        if server_info.has_error:
+            self.pending_presence_text = _t["server_unavailable"]
+        else:
+            self.pending_presence_text = _t["presence"].format(count=server_info.online_users_count, max=server_info.max_clients)
+
+        if self.presence_task is None or self.presence_task.done():
+            self.presence_task = asyncio.create_task(self.flush_presence())
+
+    async def flush_presence(self):
+        # Presence updates are rate limited by the gateway; changes arriving while waiting
+        # overwrite the pending text, so only the latest one is sent
+        delay = PRESENCE_MIN_INTERVAL - (time.monotonic() - self.presence_updated_at)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        text = self.pending_presence_text
+        if text == self.presence_text:
+            return
+        try:
+            await self.bot.change_presence(activity=discord.CustomActivity(name=text))
+            self.presence_text = text
+            self.presence_updated_at = time.monotonic()
+        except Exception as e:
+            logger.error(f"Failed to update presence: {e}")
+
+    async def publish_snapshot(self, server_info: ServerInfo, image: Optional[bytes], timeout: float):
+        # Reuses the channel render when one used the global profile, otherwise renders once for the snapshot
+        if image is None:
+            try:
+                image = await asyncio.wait_for(asyncio.to_thread(self.render_image, server_info, self.config), timeout)
+            except asyncio.TimeoutError:
+                logger.error(f"Snapshot image render did not finish within {timeout:.1f}s")
+            except Exception as e:
+                logger.error(f"Failed to generate snapshot image: {e}")
+        self.snapshot_server.publish(server_info, image)
+
+    @staticmethod
+    def render_image(server_info: ServerInfo, config: Config) -> bytes:
+        with generate_status_image(server_info, config) as img_buffer:
+            return img_buffer.getvalue()
+
+    @staticmethod
+    def stage_timeout(deadline: float, budget: float) -> float:
+        # Each stage gets its own budget, cut short by whatever is left of the cycle
+        return max(min(budget, deadline - time.monotonic()), 0.0)
+
+    def fallback_server_info(self, error: str) -> ServerInfo:
+        last = self.teamspeak.last_server_info
+        if last is not None and time.monotonic() - last.sampled_at <= self.config.stale_snapshot_max_age:
+            logger.warning(f"Showing the last good snapshot from {time.monotonic() - last.sampled_at:.0f}s ago")
+            return self.teamspeak.extrapolate_server_info()
+        return ServerInfo.from_error(error)
+
+    async def query_server_info(self, deadline: float) -> ServerInfo:
+        # The poll, including any reconnect, runs in a thread, so a hung socket can't block the event loop
+        # and is aborted on timeout. A failed poll drops the connection and the next one reconnects.
+        timeout = self.stage_timeout(deadline, self.config.ts3_query_timeout)
+        try:
+            poll = asyncio.get_running_loop().run_in_executor(self.teamspeak_executor, self.teamspeak.poll)
+            return await asyncio.wait_for(poll, timeout)
+        except asyncio.TimeoutError:
+            logger.error(f"ServerQuery did not answer within {timeout:.1f}s, dropping the connection")
+            error = "ServerQuery timed out"
+        except (TS3ConnectionClosedException, Exception) as e:
+            logger.error(f"Error getting server info: {e}")
+            error = str(e) or "Could not connect to the server"
+
+        self.teamspeak.abort()
+        return self.fallback_server_info(error)
+
+    async def render_embed(self, server_info: ServerInfo, config: Config, deadline: float) -> tuple[discord.Embed, Optional[bytes]]:
+        timeout = self.stage_timeout(deadline, self.config.render_timeout)
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(self.create_embed, server_info, config), timeout)
+        except asyncio.TimeoutError:
+            # The render thread can't be interrupted, it finishes in the background and is discarded
+            logger.error(f"Rendering did not finish within {timeout:.1f}s, sending a text embed")
+            return self.create_textual_embed(server_info, config), None
+
+    async def update_channel(self, channel: discord.TextChannel, embed: discord.Embed, image: Optional[bytes]):
+        message_id = self.message_ids.get(channel.id)
+        if message_id:
+            try:
+                message = await channel.fetch_message(message_id)
+                file = self.create_attachment(image)
+                await message.edit(embed=embed, attachments=[file] if file else [])
+            except discord.NotFound:
+                msg = await channel.send(embed=embed, file=self.create_attachment(image))
+                self.message_ids[channel.id] = msg.id
+        else:
+            await channel.purge(limit=100, check=lambda m: m.author == self.bot.user)
+            msg = await channel.send(embed=embed, file=self.create_attachment(image))
+            self.message_ids[channel.id] = msg.id
+
     @tasks.loop(seconds=30)
     async def update_status(self):
+        if not self.is_active:
+            return
+
+        deadline = time.monotonic() + self.config.cycle_deadline
         try:
             channels = await self.get_channels()
             voice_channels = await self.get_voice_channels()
-            try:
-                status = self.teamspeak.get_server_info()
-            except (TS3ConnectionClosedException, Exception) as e:
-                logger.error(f"Error getting server info: {e}")
-                self.teamspeak.connect()
+            previous_message_ids = dict(self.message_ids)
+            status = await self.query_server_info(deadline)
 
-            embed, file = self.create_embed(status)
-            
+            renders = {}
             for channel in channels:
                 if not channel:
                     continue
-                    
-                message_id = self.message_ids.get(channel.id)
+
+                # Channels sharing a profile share a single render
+                profile = self.config.profile_for(channel.id)
+                if profile not in renders:
+                    renders[profile] = await self.render_embed(status, self.config.with_profile(profile), deadline)
+                embed, image = renders[profile]
+
+                timeout = self.stage_timeout(deadline, self.config.discord_edit_timeout)
                 try:
-                    if message_id:
-                        try:
-                            message = await channel.fetch_message(message_id)
-                            await message.edit(embed=embed, attachments=[file] if file else [])
-                        except discord.NotFound:
-                            msg = await channel.send(embed=embed, file=file)
-                            self.message_ids[channel.id] = msg.id
-                    else:
-                        await channel.purge(limit=100, check=lambda m: m.author == self.bot.user)
-                        msg = await channel.send(embed=embed, file=file)
-                        self.message_ids[channel.id] = msg.id
+                    await asyncio.wait_for(self.update_channel(channel, embed, image), timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"Updating channel {channel.id} did not finish within {timeout:.1f}s")
                 except Exception as e:
                     logger.error(f"Error updating channel {channel.id}: {e}")
 
+            if self.snapshot_server is not None:
+                _, image = renders.get(self.config.profile_for(None), (None, None))
+                await self.publish_snapshot(status, image, self.stage_timeout(deadline, self.config.render_timeout))
+
+            if self.config.state_file and self.message_ids != previous_message_ids:
+                save_message_ids(self.config.state_file, self.message_ids)
+
             if voice_channels:
-                await self.update_voice_channel_count(status, voice_channels)
+                try:
+                    await asyncio.wait_for(self.update_voice_channel_count(status, voice_channels), self.stage_timeout(deadline, self.config.discord_edit_timeout))
+                except asyncio.TimeoutError:
+                    logger.error("Renaming voice channels did not finish before the cycle deadline")
+
+            if self.config.discord_presence and self.webhooks is None:
+                await self.update_presence(status)
 
         except Exception as e:
             logger.error(f"Error updating status: {e}")
 
     @update_status.before_loop
     async def before_update_status(self):
-        await self.bot.wait_until_ready()
+        if self.webhooks is None:
+            await self.bot.wait_until_ready()
 
     async def run(self):
-        await self.bot.start(self.config.discord_token)
+        if hasattr(signal, 'SIGHUP'):
+            asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self.reload_config)
+        if self.lag_monitor is not None:
+            self.lag_monitor.start()
+
+        if self.webhooks is not None:
+            await self.webhooks.start()
+            await self.start_services()
+            await self.closed.wait()
+        else:
+            await self.bot.start(self.config.discord_token)
 
     async def close(self):
+        if self.lag_monitor:
+            self.lag_monitor.stop()
         if self.teamspeak:
             self.teamspeak.close()
+        self.teamspeak_executor.shutdown(wait=False, cancel_futures=True)
+        if self.leader:
+            self.leader.release()
+        if self.snapshot_server:
+            await self.snapshot_server.close()
+        if self.webhooks:
+            await self.webhooks.close()
         await self.bot.close()
+        self.closed.set()
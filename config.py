@@ -1,5 +1,27 @@
+import json
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields, replace
+from typing import Mapping
+
+TS3_CONNECTION_FIELDS = frozenset({
+    'ts3_host',
+    'ts3_query_port_telnet',
+    'ts3_query_port_ssh',
+    'ts3_username',
+    'ts3_password',
+    'ts3_nickname',
+    'ts3_virtual_server_id',
+    'use_ssh',
+})
+
+
+@dataclass(frozen=True)
+class RenderProfile:
+    language: str
+    timezone: str
+    use_image_embed: bool
+    image_width: int
+
 
 @dataclass
 class Config:
@@ -16,36 +38,135 @@ class Config:
     ts3_nickname: str = "Discord-Bot"
     ts3_virtual_server_id: int = 1
     update_interval: int = 70
+    cycle_deadline: float = 60.0
+    ts3_query_timeout: float = 10.0
+    render_timeout: float = 15.0
+    discord_edit_timeout: float = 15.0
+    stale_snapshot_max_age: int = 300
     use_ssh: bool = True
+    ts3_pipeline_queries: bool = True
+    ts3_serverinfo_ttl: int = 600
+    ts3_servergroup_ttl: int = 3600
+    ts3_badge_server_groups: list = field(default_factory=list)
+    ts3_hidden_server_groups: list = field(default_factory=list)
+    record_file: str = ''
+    record_max_bytes: int = 10 * 1024 * 1024
+    record_backup_count: int = 5
     max_active_seconds: int = 60
     max_away_seconds: int = 300
     language: str = 'en'
     use_image_embed: bool = True
+    discord_presence: bool = False
+    discord_webhook_urls: list = field(default_factory=list)
+    image_width: int = 450
+    fallback_fonts: list = field(default_factory=list)
+    channel_profiles: dict = field(default_factory=dict)
+    config_file: str = ''
+    state_file: str = ''
+    ha_lock_file: str = ''
+    ha_poll_interval: int = 5
+    http_host: str = '0.0.0.0'
+    http_port: int = 0
+    loop_lag_threshold: float = 0.5
+
+    def profile_for(self, channel_id: int | None = None) -> RenderProfile:
+        overrides = self.channel_profiles.get(channel_id, {})
+        return RenderProfile(
+            language=overrides.get('language', self.language),
+            timezone=overrides.get('timezone', self.timezone),
+            use_image_embed=overrides.get('use_image_embed', self.use_image_embed),
+            image_width=overrides.get('image_width', self.image_width)
+        )
+
+    def with_profile(self, profile: RenderProfile) -> 'Config':
+        return replace(
+            self,
+            language=profile.language,
+            timezone=profile.timezone,
+            use_image_embed=profile.use_image_embed,
+            image_width=profile.image_width
+        )
+
+    def diff(self, other: 'Config') -> set:
+        return {f.name for f in fields(self) if getattr(self, f.name) != getattr(other, f.name)}
+
+    @classmethod
+    def load(cls) -> 'Config':
+        env = dict(os.environ)
+        config_file = env.get('CONFIG_FILE', '')
+        if config_file:
+            env.update(read_env_file(config_file))
+        return cls.from_env(env)
 
     @classmethod
-    def from_env(cls) -> 'Config':
+    def from_env(cls, env: Mapping | None = None) -> 'Config':
+        env = os.environ if env is None else env
+
         def parse_id_list(value: str) -> list:
             if not value:
                 return []
             return [int(id.strip()) for id in value.split(',') if id.strip()]
 
+        def parse_channel_profiles(value: str) -> dict:
+            # {"<channel id>": {"language": "cs", "timezone": "Europe/Prague", "use_image_embed": false, "image_width": 500}}
+            if not value:
+                return {}
+            return {int(id): dict(profile) for id, profile in json.loads(value).items()}
+
         return cls(
-            discord_token=os.getenv('DISCORD_TOKEN', ''),
-            discord_channel_ids=parse_id_list(os.getenv('DISCORD_CHANNEL_IDS', '')),
-            discord_voice_channel_ids=parse_id_list(os.getenv('DISCORD_VOICE_CHANNEL_IDS', '')),
-            ts3_host=os.getenv('TS3_HOST', ''),
-            timezone=os.getenv('TIMEZONE', 'Europe/London'),
-            ts3_query_port_telnet=int(os.getenv('TS3_QUERY_PORT_TELNET', '10011')),
-            ts3_query_port_ssh=int(os.getenv('TS3_QUERY_PORT_SSH', '10022')),
-            ts3_server_port=int(os.getenv('TS3_SERVER_PORT', '9987')),
-            ts3_username=os.getenv('TS3_USERNAME', 'serveradmin'),
-            ts3_password=os.getenv('TS3_PASSWORD', ''),
-            ts3_nickname=os.getenv('TS3_NICKNAME', 'Discord-Bot'),
-            ts3_virtual_server_id=int(os.getenv('TS3_VIRTUAL_SERVER_ID', '1')),
-            update_interval=int(os.getenv('UPDATE_INTERVAL', '70')),
-            use_ssh=os.getenv('USE_SSH', 'True').lower() in ('true', '1', 'yes'),
-            max_active_seconds=int(os.getenv('MAX_ACTIVE_SECONDS', '60')),
-            max_away_seconds=int(os.getenv('MAX_AWAY_SECONDS', '300')),
-            language=os.getenv('LANGUAGE', 'en'),
-            use_image_embed=os.getenv('USE_IMAGE_EMBED', 'True').lower() in ('true', '1', 'yes')
+            discord_token=env.get('DISCORD_TOKEN', ''),
+            discord_channel_ids=parse_id_list(env.get('DISCORD_CHANNEL_IDS', '')),
+            discord_voice_channel_ids=parse_id_list(env.get('DISCORD_VOICE_CHANNEL_IDS', '')),
+            ts3_host=env.get('TS3_HOST', ''),
+            timezone=env.get('TIMEZONE', 'Europe/London'),
+            ts3_query_port_telnet=int(env.get('TS3_QUERY_PORT_TELNET', '10011')),
+            ts3_query_port_ssh=int(env.get('TS3_QUERY_PORT_SSH', '10022')),
+            ts3_server_port=int(env.get('TS3_SERVER_PORT', '9987')),
+            ts3_username=env.get('TS3_USERNAME', 'serveradmin'),
+            ts3_password=env.get('TS3_PASSWORD', ''),
+            ts3_nickname=env.get('TS3_NICKNAME', 'Discord-Bot'),
+            ts3_virtual_server_id=int(env.get('TS3_VIRTUAL_SERVER_ID', '1')),
+            update_interval=int(env.get('UPDATE_INTERVAL', '70')),
+            cycle_deadline=float(env.get('CYCLE_DEADLINE', '60')),
+            ts3_query_timeout=float(env.get('TS3_QUERY_TIMEOUT', '10')),
+            render_timeout=float(env.get('RENDER_TIMEOUT', '15')),
+            discord_edit_timeout=float(env.get('DISCORD_EDIT_TIMEOUT', '15')),
+            stale_snapshot_max_age=int(env.get('STALE_SNAPSHOT_MAX_AGE', '300')),
+            use_ssh=env.get('USE_SSH', 'True').lower() in ('true', '1', 'yes'),
+            ts3_pipeline_queries=env.get('TS3_PIPELINE_QUERIES', 'True').lower() in ('true', '1', 'yes'),
+            ts3_serverinfo_ttl=int(env.get('TS3_SERVERINFO_TTL', '600')),
+            ts3_servergroup_ttl=int(env.get('TS3_SERVERGROUP_TTL', '3600')),
+            ts3_badge_server_groups=parse_id_list(env.get('TS3_BADGE_SERVER_GROUPS', '')),
+            ts3_hidden_server_groups=parse_id_list(env.get('TS3_HIDDEN_SERVER_GROUPS', '')),
+            record_file=env.get('RECORD_FILE', ''),
+            record_max_bytes=int(env.get('RECORD_MAX_BYTES', str(10 * 1024 * 1024))),
+            record_backup_count=int(env.get('RECORD_BACKUP_COUNT', '5')),
+            max_active_seconds=int(env.get('MAX_ACTIVE_SECONDS', '60')),
+            max_away_seconds=int(env.get('MAX_AWAY_SECONDS', '300')),
+            language=env.get('LANGUAGE', 'en'),
+            use_image_embed=env.get('USE_IMAGE_EMBED', 'True').lower() in ('true', '1', 'yes'),
+            discord_webhook_urls=[url.strip() for url in env.get('DISCORD_WEBHOOK_URLS', '').split(',') if url.strip()],
+            discord_presence=env.get('DISCORD_PRESENCE', 'False').lower() in ('true', '1', 'yes'),
+            image_width=int(env.get('IMAGE_WIDTH', '450')),
+            fallback_fonts=[path.strip() for path in env.get('FALLBACK_FONTS', '').split(',') if path.strip()],
+            channel_profiles=parse_channel_profiles(env.get('DISCORD_CHANNEL_PROFILES', '')),
+            config_file=env.get('CONFIG_FILE', ''),
+            state_file=env.get('STATE_FILE', ''),
+            ha_lock_file=env.get('HA_LOCK_FILE', ''),
+            ha_poll_interval=int(env.get('HA_POLL_INTERVAL', '5')),
+            http_host=env.get('HTTP_HOST', '0.0.0.0'),
+            http_port=int(env.get('HTTP_PORT', '0')),
+            loop_lag_threshold=float(env.get('LOOP_LAG_THRESHOLD', '0.5'))
         )
+
+
+def read_env_file(path: str) -> dict:
+    values = {}
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            values[key.strip()] = value.strip().strip('"\'')
+    return values
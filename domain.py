@@ -1,5 +1,23 @@
-from dataclasses import dataclass
-from typing import List
+from dataclasses import dataclass, field, replace
+from typing import Dict, List, Optional
+
+def parse_server_group_ids(data: dict) -> List[int]:
+    return [int(id) for id in data.get('client_servergroups', '').split(',') if id.strip()]
+
+@dataclass(frozen=True)
+class ServerGroup:
+    id: int
+    name: str
+    icon_id: int
+
+    @classmethod
+    def from_serverquery_response(cls, data: dict) -> 'ServerGroup':
+        return cls(
+            id=int(data.get('sgid', 0)),
+            name=data.get('name', 'Unknown'),
+            # Icon ids are unsigned 32 bit, but older servers report them as signed
+            icon_id=int(data.get('iconid', 0)) & 0xFFFFFFFF
+        )
 
 @dataclass
 class Client:
@@ -9,16 +27,18 @@ class Client:
     input_muted: int
     output_muted: int
     idle_time: int
+    badges: List[str] = field(default_factory=list)
 
     @classmethod
-    def from_serverquery_response(cls, data: dict) -> 'Client':
+    def from_serverquery_response(cls, data: dict, server_groups: Optional[Dict[int, ServerGroup]] = None) -> 'Client':
         return cls(
             nickname=data.get('client_nickname', 'Unknown'),
             type=data.get('client_type', '0'),
             flag_talking=int(data.get('client_flag_talking', 0)),
             input_muted=int(data.get('client_input_muted', 0)),
             output_muted=int(data.get('client_output_muted', 0)),
-            idle_time=int(data.get('client_idle_time', 0))
+            idle_time=int(data.get('client_idle_time', 0)),
+            badges=[server_groups[id].name for id in parse_server_group_ids(data) if id in server_groups] if server_groups else []
         )
     
     @property
@@ -60,17 +80,32 @@ class ServerInfo:
     virtualserver_uptime: int
     clients: List[Client]
     error: str | None = None
-    
+    sampled_at: float = 0.0  # time.monotonic() of the poll the values were taken at
+
     @classmethod
-    def from_serverquery_response(cls, server_data: dict, client_list: List[dict]) -> 'ServerInfo':
-        users = [Client.from_serverquery_response(c) for c in client_list if c.get('client_type') == '0']
+    def from_serverquery_response(cls, server_data: dict, client_list: List[dict], sampled_at: float = 0.0,
+                                  server_groups: Optional[Dict[int, ServerGroup]] = None) -> 'ServerInfo':
+        users = [Client.from_serverquery_response(c, server_groups) for c in client_list if c.get('client_type') == '0']
         return cls(
             virtualserver_name=server_data.get('virtualserver_name', 'Unknown'),
             virtualserver_maxclients=int(server_data.get('virtualserver_maxclients', 0)),
             virtualserver_uptime=int(server_data.get('virtualserver_uptime', 0)),
-            clients=users
+            clients=users,
+            sampled_at=sampled_at
         )
-    
+
+    def advanced_to(self, now: float) -> 'ServerInfo':
+        if self.has_error or not self.sampled_at:
+            return self
+
+        elapsed = max(now - self.sampled_at, 0.0)
+        return replace(
+            self,
+            virtualserver_uptime=self.virtualserver_uptime + int(elapsed),
+            clients=[replace(c, idle_time=c.idle_time + int(elapsed * 1000)) for c in self.clients],
+            sampled_at=now
+        )
+
     
     @classmethod
     def from_error(cls, error: str) -> 'ServerInfo':
@@ -0,0 +1,70 @@
+from config import Config
+from domain import ServerInfo
+from i18n import get_translator
+
+# Plain dicts in Discord's embed format, so they can be sent without importing discord.py
+COLOR_GREEN = 0x2ecc71
+COLOR_RED = 0xe74c3c
+
+IMAGE_FILENAME = "status.png"
+
+
+def build_image_embed() -> dict:
+    return {
+        "type": "rich",
+        "color": COLOR_GREEN,
+        "image": {"url": f"attachment://{IMAGE_FILENAME}"},
+    }
+
+
+def build_text_embed(server_info: ServerInfo, config: Config) -> dict:
+    _t = get_translator(config)
+
+    if server_info.has_error:
+        return {
+            "type": "rich",
+            "title": f"⚠️ {_t['server_unavailable']}",
+            "description": f"{config.ts3_host}:{config.ts3_server_port}",
+            "color": COLOR_RED,
+            "fields": [{"name": _t["error"], "value": server_info.errormsg, "inline": False}],
+        }
+
+    fields = [
+        {
+            "name": f"👨‍👨‍👦‍👦 {_t['users_online']}",
+            "value": f"{server_info.online_users_count}/{server_info.max_clients}",
+            "inline": True,
+        },
+        {
+            "name": f"⌚{_t['uptime']}",
+            "value": f"{server_info.uptime_formatted}",
+            "inline": True,
+        },
+    ]
+
+    if server_info.clients:
+        user_list = []
+        for client in server_info.clients:
+            if client.idle_time_seconds < config.max_active_seconds:
+                status_icon = "🟢"
+            elif client.idle_time_seconds < config.max_away_seconds:
+                status_icon = "🟡"
+            else:
+                status_icon = "🔴"
+
+            badges = "".join(f" `{badge}`" for badge in client.badges)
+            user_list.append(
+                f"{status_icon} **{client.nickname}**{badges} (*{client.idle_time_formatted}* {_t['ago']})")
+
+        fields.append({
+            "name": f"👥 {_t['users_header']}",
+            "value": "\n".join(user_list) if user_list else _t["no_users"],
+            "inline": False,
+        })
+
+    return {
+        "type": "rich",
+        "title": f"🎤 {server_info.name}",
+        "color": COLOR_GREEN,
+        "fields": fields,
+    }
@@ -0,0 +1,93 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import hashlib
+import json
+import logging
+from typing import Callable, Optional
+
+from aiohttp import web
+
+from domain import ServerInfo
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    body: bytes
+    content_type: str
+    etag: str
+
+    @classmethod
+    def from_bytes(cls, body: bytes, content_type: str) -> 'Snapshot':
+        return cls(body=body, content_type=content_type, etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+
+
+def server_info_to_json(server_info: ServerInfo) -> bytes:
+    return json.dumps({
+        "name": server_info.name,
+        "max_clients": server_info.max_clients,
+        "uptime": server_info.uptime,
+        "online_users_count": server_info.online_users_count,
+        "clients": [
+            {
+                "nickname": client.nickname,
+                "talking": client.is_talking,
+                "input_muted": client.is_input_muted,
+                "output_muted": client.is_output_muted,
+                "idle_time": client.idle_time,
+                "badges": client.badges,
+            }
+            for client in server_info.clients
+        ],
+        "error": server_info.error,
+        "updated_at": datetime.now(tz=timezone.utc).isoformat(),
+    }).encode()
+
+
+class SnapshotServer:
+    # Serves the last published status from memory, so dashboard requests never reach ServerQuery
+    def __init__(self, host: str, port: int):
+        self.host = host
+        self.port = port
+        self.snapshots: dict[str, Snapshot] = {}
+        self.json_routes: dict[str, Callable[[], dict]] = {}
+        self.runner: Optional[web.AppRunner] = None
+
+    def add_json_route(self, path: str, provider: Callable[[], dict]):
+        # For live values that are computed per request instead of published per cycle
+        self.json_routes[path] = provider
+
+    def publish(self, server_info: ServerInfo, image: Optional[bytes]):
+        self.snapshots["/status.json"] = Snapshot.from_bytes(server_info_to_json(server_info), "application/json")
+        if image is not None:
+            self.snapshots["/status.png"] = Snapshot.from_bytes(image, "image/png")
+
+    async def handle(self, request: web.Request) -> web.Response:
+        snapshot = self.snapshots.get(request.path)
+        if snapshot is None:
+            return web.Response(status=503, text="No status available yet")
+
+        headers = {"ETag": snapshot.etag, "Cache-Control": "no-cache"}
+        if_none_match = request.headers.get("If-None-Match", "")
+        if if_none_match.strip() == "*" or snapshot.etag in (tag.strip() for tag in if_none_match.split(",")):
+            return web.Response(status=304, headers=headers)
+
+        return web.Response(body=snapshot.body, content_type=snapshot.content_type, headers=headers)
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/status.json", self.handle)
+        app.router.add_get("/status.png", self.handle)
+        for path, provider in self.json_routes.items():
+            app.router.add_get(path, lambda request, provider=provider: web.json_response(provider()))
+
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        logger.info(f"Serving status snapshots on http://{self.host}:{self.port}")
+
+    async def close(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+            self.runner = None
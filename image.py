@@ -1,12 +1,24 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 from PIL import Image, ImageDraw, ImageFont
 from datetime import datetime
+from typing import List
 import io
+import logging
+import os
+import threading
+import unicodedata
+
+from fontTools.ttLib import TTFont
 
 from config import Config
 from domain import ServerInfo
 from i18n import get_translator
 
+logger = logging.getLogger(__name__)
+
 COLORS = {
     "card_bg": "#1e1f22",
     "text_primary": "#f2f3f5",
@@ -31,6 +43,8 @@ RADIUS = 12
 ICON_SIZE = (16, 16)
 PADDING_LEFT = 20
 PADDING_TOP = 15
+FOOTER_HEIGHT = 25
+DASHBOARD_DIVIDER = 1
 FONT_SIZES = {
     "title": 18,
     "normal": 14,
@@ -44,12 +58,72 @@ ICON_CACHE = {
     "default": Image.open(ICON_PATH_DEFAULT).resize(ICON_SIZE, Image.LANCZOS),
 }
 
+# Least recently used panels are evicted first; renders may overlap in worker threads, hence the lock
+DASHBOARD_PANEL_CACHE: OrderedDict = OrderedDict()
+DASHBOARD_PANEL_CACHE_SIZE = 64
+DASHBOARD_PANEL_CACHE_LOCK = threading.Lock()
+
 def hex_to_rgb(hex_color) -> tuple[int, int, int]:
     hex_color = hex_color.lstrip('#')
     return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
 
-def get_font(size) -> ImageFont.FreeTypeFont:
-    return ImageFont.truetype(FONT_PATH, size)
+@lru_cache(maxsize=None)
+def get_font(size, path: str = FONT_PATH) -> ImageFont.FreeTypeFont:
+    return ImageFont.truetype(path, size)
+
+@lru_cache(maxsize=None)
+def get_font_coverage(path: str) -> frozenset:
+    # Codepoints the font has glyphs for, read from its cmap once per font file
+    with TTFont(path, lazy=True, fontNumber=0) as font:
+        if not {'glyf', 'CFF ', 'CFF2'} & set(font.keys()):
+            raise ValueError("bitmap-only fonts can't be scaled")
+        return frozenset(font.getBestCmap() or ())
+
+@lru_cache(maxsize=None)
+def get_font_chain(fallback_fonts: tuple) -> tuple:
+    chain = [FONT_PATH]
+    for path in fallback_fonts:
+        try:
+            get_font_coverage(path)
+            chain.append(path)
+        except Exception as e:
+            logger.warning(f"Skipping fallback font {path}: {e}")
+    return tuple(chain)
+
+@lru_cache(maxsize=4096)
+def split_font_runs(text: str, font_chain: tuple) -> tuple:
+    # Splits text into (run, font path) pairs, each drawn with the first font in the chain that covers it.
+    # Cached per text, so a user list that doesn't change isn't probed again every frame.
+    runs = []
+    for char in text:
+        is_mark = unicodedata.category(char) in ('Mn', 'Me', 'Cf')
+        if runs and (is_mark or (char.isspace() and ord(char) in get_font_coverage(runs[-1][1]))):
+            # Combining marks, joiners and variation selectors belong to the glyph before them,
+            # and spaces stay in the current run when its font has them
+            path = runs[-1][1]
+        else:
+            path = next((path for path in font_chain if ord(char) in get_font_coverage(path)), font_chain[0])
+        if runs and runs[-1][1] == path:
+            runs[-1][0] += char
+        else:
+            runs.append([char, path])
+    return tuple((run, path) for run, path in runs)
+
+def draw_text(draw: ImageDraw.ImageDraw, xy, text: str, fill, size: int, config: Config) -> float:
+    runs = split_font_runs(text, get_font_chain(tuple(config.fallback_fonts)))
+    if len(runs) <= 1 and (not runs or runs[0][1] == FONT_PATH):
+        font = get_font(size)
+        draw.text(xy, text, fill=fill, font=font)
+        return font.getlength(text)
+
+    # Fonts differ in ascent, so the runs share the baseline of the primary font
+    x, y = xy
+    baseline = y + get_font(size).getmetrics()[0]
+    for run, path in runs:
+        font = get_font(size, path)
+        draw.text((x, baseline), run, fill=fill, font=font, anchor='ls')
+        x += font.getlength(run)
+    return x - xy[0]
 
 def draw_rounded_rectangle(draw: ImageDraw.ImageDraw, xy, radius, fill, outline=None, width=1):
     draw.rounded_rectangle(xy, radius=radius, fill=fill, outline=outline, width=width)
@@ -80,23 +154,21 @@ def get_activity_color(idle_time_ms: int, config: Config) -> str:
     else:
         return COLORS["red"]
 
-def draw_error(draw, errormsg, width, y_offset, _translate):
+def draw_error(draw, errormsg, config, width, y_offset, _translate):
     font_title = get_font(FONT_SIZES["title"])
-    font_normal = get_font(FONT_SIZES["normal"])
     draw.text((PADDING_LEFT, y_offset), _translate["server_unavailable"],
               fill=hex_to_rgb(COLORS["red"]), font=font_title)
     y_offset += 35
-    draw.text((PADDING_LEFT, y_offset), f"{_translate['error_prefix']}{errormsg}",
-              fill=hex_to_rgb(COLORS["text_secondary"]), font=font_normal)
+    draw_text(draw, (PADDING_LEFT, y_offset), f"{_translate['error_prefix']}{errormsg}",
+              hex_to_rgb(COLORS["text_secondary"]), FONT_SIZES["normal"], config)
     y_offset += 35
     return y_offset
 
-def draw_header(draw, server_info, width, y_offset, _translate):
-    font_title = get_font(FONT_SIZES["title"])
+def draw_header(draw, server_info, config, width, y_offset, _translate):
     font_normal = get_font(FONT_SIZES["normal"])
 
-    draw.text((PADDING_LEFT, y_offset), server_info.name,
-              fill=hex_to_rgb(COLORS["text_primary"]), font=font_title)
+    draw_text(draw, (PADDING_LEFT, y_offset), server_info.name,
+              hex_to_rgb(COLORS["text_primary"]), FONT_SIZES["title"], config)
 
     y_offset += 35
 
@@ -134,51 +206,140 @@ def draw_users(draw, img, online_users, config, y_offset, _translate):
                   status_icon if status_icon.mode == 'RGBA' else None)
 
         username_x = PADDING_LEFT + 20
-        draw.text((username_x, y_offset), user.nickname,
-                  fill=hex_to_rgb(COLORS["text_primary"]), font=font_normal)
+        draw_text(draw, (username_x, y_offset), user.nickname,
+                  hex_to_rgb(COLORS["text_primary"]), FONT_SIZES["normal"], config)
 
         idle_x = username_x + 180
         idle_text = f"({user.idle_time_formatted} {_translate['ago']})"
         idle_color = get_activity_color(user.idle_time, config)
         draw.text((idle_x, y_offset), idle_text, fill=hex_to_rgb(idle_color), font=font_small)
+
+        if user.badges:
+            badges_x = idle_x + font_small.getlength(idle_text) + 8
+            draw_text(draw, (badges_x, y_offset), " ".join(f"[{badge}]" for badge in user.badges),
+                      hex_to_rgb(COLORS["accent"]), FONT_SIZES["small"], config)
         y_offset += LINE_HEIGHT
 
     return y_offset
 
-def draw_footer(draw, config, width, y_offset, _translate):
+def draw_footer(draw, config, width, y_offset, _translate, timestamp: datetime | None = None):
     font_normal = get_font(FONT_SIZES["normal"])
-    timestamp = datetime.now(tz=ZoneInfo(config.timezone)).strftime('%H:%M:%S')
+    timestamp = (timestamp or datetime.now(tz=ZoneInfo(config.timezone))).strftime('%H:%M:%S')
     draw.text((PADDING_LEFT, y_offset), f"{_translate['last_updated']} {timestamp}", fill=hex_to_rgb(COLORS["text_secondary"]), font=font_normal)
 
-def generate_status_image(server_info: ServerInfo, config: Config, width=450) -> io.BytesIO:
-    _translate = get_translator(config)
-    
-    base_height = HEIGHT_BASE
+def get_card_height(server_info: ServerInfo) -> int:
     if not server_info.has_error and server_info.online_users_count > 0:
         user_count = server_info.online_users_count
         user_list_height = max(user_count * LINE_HEIGHT, 30)
-        height = base_height + user_list_height
-    else:
-        height = 110
-
-    img = Image.new('RGBA', (width, height), hex_to_rgb(COLORS["card_bg"]) + (255,))
-    draw = ImageDraw.Draw(img)
+        return HEIGHT_BASE + user_list_height
+    return 110
 
+def draw_card_body(draw, img, server_info: ServerInfo, config: Config, width, _translate) -> int:
     y_offset = PADDING_TOP
 
     if server_info.has_error:
-        y_offset = draw_error(draw, server_info.errormsg, width, y_offset, _translate)
+        y_offset = draw_error(draw, server_info.errormsg, config, width, y_offset, _translate)
     else:
-        y_offset = draw_header(draw, server_info, width, y_offset, _translate)
+        y_offset = draw_header(draw, server_info, config, width, y_offset, _translate)
         if server_info.online_users:
             y_offset = draw_users(draw, img, server_info.online_users, config, y_offset, _translate)
         y_offset += 10
 
-    draw_footer(draw, config, width, y_offset, _translate)
-
-    img = add_rounded_corners(img, radius=RADIUS)
+    return y_offset
 
+def encode_png(img: Image.Image) -> io.BytesIO:
     buffer = io.BytesIO()
     img.save(buffer, 'PNG', optimize=True)
     buffer.seek(0)
     return buffer
+
+def generate_status_image(server_info: ServerInfo, config: Config, width: int | None = None,
+                          timestamp: datetime | None = None) -> io.BytesIO:
+    _translate = get_translator(config)
+    width = width or config.image_width
+
+    img = Image.new('RGBA', (width, get_card_height(server_info)), hex_to_rgb(COLORS["card_bg"]) + (255,))
+    draw = ImageDraw.Draw(img)
+
+    y_offset = draw_card_body(draw, img, server_info, config, width, _translate)
+    draw_footer(draw, config, width, y_offset, _translate, timestamp)
+
+    img = add_rounded_corners(img, radius=RADIUS)
+    return encode_png(img)
+
+def get_panel_cache_key(server_info: ServerInfo, config: Config, width) -> tuple:
+    # Everything a panel shows, at the granularity it is shown, so extrapolated idle times
+    # and uptimes only invalidate a panel once its visible text changes
+    fonts = tuple(config.fallback_fonts)
+    if server_info.has_error:
+        return (width, config.language, fonts, server_info.errormsg)
+    clients = tuple(
+        (c.nickname, c.flag_talking, c.input_muted, c.output_muted, c.idle_time_formatted, get_activity_color(c.idle_time, config),
+         tuple(c.badges))
+        for c in server_info.online_users
+    )
+    return (width, config.language, fonts, server_info.name, server_info.max_clients, server_info.uptime_formatted, clients)
+
+def get_cached_panels(keys: List[tuple]) -> dict:
+    with DASHBOARD_PANEL_CACHE_LOCK:
+        panels = {}
+        for key in keys:
+            if key in DASHBOARD_PANEL_CACHE:
+                DASHBOARD_PANEL_CACHE.move_to_end(key)
+                panels[key] = DASHBOARD_PANEL_CACHE[key]
+        return panels
+
+def cache_panels(panels: dict):
+    with DASHBOARD_PANEL_CACHE_LOCK:
+        for key, panel in panels.items():
+            DASHBOARD_PANEL_CACHE[key] = panel
+            DASHBOARD_PANEL_CACHE.move_to_end(key)
+        while len(DASHBOARD_PANEL_CACHE) > DASHBOARD_PANEL_CACHE_SIZE:
+            DASHBOARD_PANEL_CACHE.popitem(last=False)
+
+def render_dashboard_panel(server_info: ServerInfo, config: Config, width) -> Image.Image:
+    _translate = get_translator(config)
+    img = Image.new('RGBA', (width, get_card_height(server_info) - FOOTER_HEIGHT), hex_to_rgb(COLORS["card_bg"]) + (255,))
+    draw = ImageDraw.Draw(img)
+    draw_card_body(draw, img, server_info, config, width, _translate)
+    return img
+
+def generate_dashboard_image(server_infos: List[ServerInfo], config: Config, columns: int = 2, width: int | None = None,
+                             timestamp: datetime | None = None) -> io.BytesIO:
+    _translate = get_translator(config)
+    width = width or config.image_width
+    columns = max(1, min(columns, len(server_infos)))
+
+    keys = [get_panel_cache_key(server_info, config, width) for server_info in server_infos]
+    panels = get_cached_panels(keys)
+    missing = {key: server_info for key, server_info in zip(keys, server_infos) if key not in panels}
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(len(missing), os.cpu_count() or 1)) as executor:
+            rendered = executor.map(lambda server_info: render_dashboard_panel(server_info, config, width), missing.values())
+            panels.update(zip(missing.keys(), rendered))
+        cache_panels({key: panels[key] for key in missing})
+
+    rows = [keys[i:i + columns] for i in range(0, len(keys), columns)]
+    row_heights = [max(panels[key].height for key in row) for row in rows]
+    total_width = columns * width + (columns - 1) * DASHBOARD_DIVIDER
+    total_height = sum(row_heights) + (len(rows) - 1) * DASHBOARD_DIVIDER + FOOTER_HEIGHT
+
+    img = Image.new('RGBA', (total_width, total_height), hex_to_rgb(COLORS["card_bg"]) + (255,))
+    draw = ImageDraw.Draw(img)
+
+    y_offset = 0
+    for row, row_height in zip(rows, row_heights):
+        for column, key in enumerate(row):
+            img.paste(panels[key], (column * (width + DASHBOARD_DIVIDER), y_offset))
+        for column in range(1, columns):
+            x = column * (width + DASHBOARD_DIVIDER) - DASHBOARD_DIVIDER
+            draw.line([(x, y_offset), (x, y_offset + row_height)], fill=hex_to_rgb(COLORS["border"]), width=DASHBOARD_DIVIDER)
+        y_offset += row_height
+        if row is not rows[-1]:
+            draw.line([(0, y_offset), (total_width, y_offset)], fill=hex_to_rgb(COLORS["border"]), width=DASHBOARD_DIVIDER)
+            y_offset += DASHBOARD_DIVIDER
+
+    draw_footer(draw, config, total_width, y_offset, _translate, timestamp)
+
+    img = add_rounded_corners(img, radius=RADIUS)
+    return encode_png(img)
@@ -0,0 +1,46 @@
+import fcntl
+import logging
+import os
+import socket
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLock:
+    # An exclusive flock on a file on a volume shared by all replicas. The kernel drops the lock
+    # when the holding process dies, letting a standby take over on its next attempt.
+    def __init__(self, path: str):
+        self.path = path
+        self.fd: Optional[int] = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self.fd is not None
+
+    def try_acquire(self) -> bool:
+        if self.fd is not None:
+            return True
+
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+
+        os.ftruncate(fd, 0)
+        os.write(fd, f"{socket.gethostname()} {os.getpid()}\n".encode())
+        self.fd = fd
+        logger.info(f"Acquired leader lock {self.path}")
+        return True
+
+    def release(self):
+        if self.fd is None:
+            return
+        try:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self.fd)
+            self.fd = None
+        logger.info(f"Released leader lock {self.path}")
@@ -0,0 +1,87 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_INTERVAL = 0.25
+REPORT_INTERVAL = 300
+WINDOW_SIZE = 2400  # ten minutes of samples
+
+
+class LoopLagMonitor:
+    # A task on the loop measures how late its sleeps wake up. A separate thread watches the
+    # task's heartbeat, so while the loop is blocked it can still log what the loop is running.
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self.samples: deque = deque(maxlen=WINDOW_SIZE)
+        self.heartbeat = time.monotonic()
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.loop_thread_id: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.stop_event = threading.Event()
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.loop_thread_id = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.task = self.loop.create_task(self.measure())
+        threading.Thread(target=self.watch, name="loop-lag-watchdog", daemon=True).start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.task is not None:
+            self.task.cancel()
+            self.task = None
+
+    async def measure(self):
+        last_report = time.monotonic()
+        while True:
+            expected = time.monotonic() + SAMPLE_INTERVAL
+            await asyncio.sleep(SAMPLE_INTERVAL)
+            now = time.monotonic()
+            self.samples.append(max(now - expected, 0.0))
+            self.heartbeat = now
+
+            if now - last_report >= REPORT_INTERVAL:
+                last_report = now
+                stats = self.percentiles()
+                logger.info(f"Event loop lag p50={stats['p50_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms "
+                            f"p99={stats['p99_ms']:.1f}ms max={stats['max_ms']:.1f}ms")
+
+    def watch(self):
+        reported_heartbeat = None
+        while not self.stop_event.wait(SAMPLE_INTERVAL):
+            heartbeat = self.heartbeat
+            stalled = time.monotonic() - heartbeat - SAMPLE_INTERVAL
+            # One report per stall, taken while the loop is still stuck in the offending code
+            if stalled < self.threshold or heartbeat == reported_heartbeat:
+                continue
+            reported_heartbeat = heartbeat
+
+            task = asyncio.current_task(self.loop)
+            frame = sys._current_frames().get(self.loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "  <unavailable>\n"
+            logger.warning(f"Event loop blocked for {stalled:.2f}s in "
+                           f"{task.get_name() if task else 'a callback'}, currently at:\n{stack}")
+
+    def percentiles(self) -> dict:
+        samples = sorted(self.samples)
+        if not samples:
+            return {"samples": 0, "p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "max_ms": 0.0}
+
+        def percentile(p: float) -> float:
+            return samples[min(int(len(samples) * p), len(samples) - 1)] * 1000
+
+        return {
+            "samples": len(samples),
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": samples[-1] * 1000,
+        }
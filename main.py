@@ -9,15 +9,16 @@ logger = logging.getLogger(__name__)
 
 
 async def main():
-    config = Config.from_env()
+    config = Config.load()
 
-    if not config.discord_token:
-        logger.error("DISCORD_TOKEN not set")
-        return
+    if not config.discord_webhook_urls:
+        if not config.discord_token:
+            logger.error("DISCORD_TOKEN not set")
+            return
 
-    if not config.discord_channel_ids:
-        logger.error("DISCORD_CHANNEL_ID not set")
-        return
+        if not config.discord_channel_ids:
+            logger.error("DISCORD_CHANNEL_ID not set")
+            return
 
     if not config.ts3_host:
         logger.error("TS3_HOST not set")
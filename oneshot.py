@@ -0,0 +1,176 @@
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Optional
+
+from config import Config
+from domain import ServerInfo
+from embeds import IMAGE_FILENAME, build_image_embed, build_text_embed
+from state import load_message_ids, save_message_ids
+from teamspeak import Teamspeak
+
+# Pushes a single status update through Discord's REST API and exits, for cron style scheduling.
+# discord.py and Pillow are deliberately not imported up front, they dominate startup time.
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+API_BASE = "https://discord.com/api/v10"
+USER_AGENT = "DiscordBot (https://github.com/rale2k/discord-ts3-status, 1.0)"
+REQUEST_TIMEOUT = 15
+MAX_RATE_LIMIT_RETRIES = 2
+
+
+def discord_request(method: str, url: str, payload: dict, image: Optional[bytes] = None, token: Optional[str] = None) -> dict:
+    headers = {"User-Agent": USER_AGENT}
+    if token:
+        headers["Authorization"] = f"Bot {token}"
+
+    if image is None:
+        body = json.dumps(payload).encode()
+        headers["Content-Type"] = "application/json"
+    else:
+        payload = dict(payload, attachments=[{"id": 0, "filename": IMAGE_FILENAME}])
+        boundary = uuid.uuid4().hex
+        body = b"".join([
+            f"--{boundary}\r\n".encode(),
+            b'Content-Disposition: form-data; name="payload_json"\r\n',
+            b"Content-Type: application/json\r\n\r\n",
+            json.dumps(payload).encode(),
+            f"\r\n--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="files[0]"; filename="{IMAGE_FILENAME}"\r\n'.encode(),
+            b"Content-Type: image/png\r\n\r\n",
+            image,
+            f"\r\n--{boundary}--\r\n".encode(),
+        ])
+        headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+
+    request = urllib.request.Request(url, data=body, method=method, headers=headers)
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        try:
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                return json.loads(response.read() or b"{}")
+        except urllib.error.HTTPError as e:
+            if e.code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+                raise
+            retry_after = float(json.loads(e.read() or b"{}").get("retry_after", 1))
+            logger.warning(f"Rate limited, retrying in {retry_after:.1f}s")
+            time.sleep(retry_after)
+
+
+def push(target_id: int, messages_url: str, send_url: str, token: Optional[str],
+         embed: dict, image: Optional[bytes], message_id: Optional[int]) -> int:
+    payload = {"embeds": [embed], "attachments": []}
+    if message_id:
+        try:
+            discord_request("PATCH", f"{messages_url}/{message_id}", payload, image, token)
+            return message_id
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+            logger.info(f"Message {message_id} in {target_id} is gone, posting a new one")
+
+    return int(discord_request("POST", send_url, payload, image, token)["id"])
+
+
+def get_targets(config: Config) -> list:
+    # (id, messages url, send url, bot token) for every channel and webhook
+    targets = []
+    for channel_id in config.discord_channel_ids:
+        url = f"{API_BASE}/channels/{channel_id}/messages"
+        targets.append((channel_id, url, url, config.discord_token))
+    for webhook_url in config.discord_webhook_urls:
+        webhook_url = webhook_url.rstrip("/")
+        webhook_id = int(webhook_url.split("/")[-2])
+        targets.append((webhook_id, f"{webhook_url}/messages", f"{webhook_url}?wait=true", None))
+    return targets
+
+
+def render(server_info: ServerInfo, config: Config) -> tuple[dict, Optional[bytes]]:
+    if config.use_image_embed:
+        try:
+            from image import generate_status_image
+            with generate_status_image(server_info, config) as img_buffer:
+                return build_image_embed(), img_buffer.getvalue()
+        except Exception as e:
+            logger.error(f"Failed to generate status image: {e}")
+    return build_text_embed(server_info, config), None
+
+
+def poll_with_timeout(teamspeak: Teamspeak, timeout: float) -> ServerInfo:
+    # Discord calls are bounded by REQUEST_TIMEOUT, ServerQuery sockets have no timeout of their own
+    result = {}
+
+    def poll():
+        try:
+            result["status"] = teamspeak.poll()
+        except Exception as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=poll, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        teamspeak.abort()
+        raise TimeoutError(f"ServerQuery did not answer within {timeout:.1f}s")
+    if "error" in result:
+        raise result["error"]
+    return result["status"]
+
+
+def main() -> int:
+    config = Config.load()
+
+    if not config.ts3_host:
+        logger.error("TS3_HOST not set")
+        return 1
+    if not config.discord_webhook_urls and not (config.discord_token and config.discord_channel_ids):
+        logger.error("Set DISCORD_TOKEN and DISCORD_CHANNEL_IDS, or DISCORD_WEBHOOK_URLS")
+        return 1
+    if not config.state_file:
+        logger.warning("STATE_FILE not set, every run will post a new message instead of editing the last one")
+
+    teamspeak = Teamspeak(config)
+    try:
+        status = poll_with_timeout(teamspeak, config.ts3_query_timeout)
+    except Exception as e:
+        logger.error(f"Error getting server info: {e}")
+        status = ServerInfo.from_error(str(e) or "Could not connect to the server")
+    finally:
+        teamspeak.close()
+
+    message_ids = load_message_ids(config.state_file) if config.state_file else {}
+    previous_message_ids = dict(message_ids)
+    renders = {}
+    failed = False
+    for target_id, messages_url, send_url, token in get_targets(config):
+        profile = config.profile_for(target_id)
+        if profile not in renders:
+            renders[profile] = render(status, config.with_profile(profile))
+        embed, image = renders[profile]
+
+        try:
+            message_ids[target_id] = push(target_id, messages_url, send_url, token, embed, image, message_ids.get(target_id))
+        except Exception as e:
+            logger.error(f"Error updating {target_id}: {e}")
+            failed = True
+
+    if config.state_file and message_ids != previous_message_ids:
+        save_message_ids(config.state_file, message_ids)
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit_code = main()
+    # A connect stuck in the handshake can't be aborted and ts3API's reader thread isn't a daemon,
+    # so exit without joining it rather than letting cron runs pile up
+    logging.shutdown()
+    sys.stdout.flush()
+    os._exit(exit_code)
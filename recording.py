@@ -0,0 +1,84 @@
+import gzip
+import json
+import logging
+import os
+import time
+import zlib
+from typing import IO, Iterator, List, Optional
+
+from domain import ServerInfo
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseRecorder:
+    # Writes raw ServerQuery responses as gzipped JSON lines, rotating like logging's RotatingFileHandler
+    def __init__(self, path: str, max_bytes: int, backup_count: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.file: Optional[IO[str]] = None
+
+    def record(self, responses: dict[str, bytes]):
+        if self.file is None:
+            # A bot killed without close() leaves its gzip stream unfinished, and anything appended
+            # behind it is unreadable, so a file left over from an earlier run is rotated away first
+            if os.path.exists(self.path):
+                self.rotate()
+            self.file = gzip.open(self.path, 'wt', encoding='utf-8')
+
+        self.file.write(json.dumps({
+            "t": time.time(),
+            "responses": {command: resp.decode('utf-8', 'surrogateescape') for command, resp in responses.items()},
+        }) + "\n")
+        # Sync flush so every record written so far can be read back even if the stream is never finished
+        self.file.flush()
+
+        if self.max_bytes and os.path.getsize(self.path) >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{i}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+def read_records(paths: List[str]) -> Iterator[dict]:
+    for path in paths:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # The last line of a file the bot was writing to when it died
+                        logger.warning(f"Skipping truncated record in {path}")
+            except (EOFError, zlib.error) as e:
+                # The file the bot is still writing to, or was when it died
+                logger.warning(f"{path} ends in an unfinished gzip stream, stopping there: {e}")
+
+
+def replay_server_infos(paths: List[str], teamspeak) -> Iterator[tuple[float, ServerInfo]]:
+    # Recordings only contain serverinfo and servergrouplist when their TTL ran out, so the records are
+    # fed through the Teamspeak caches in order, the recorded time standing in for the poll time
+    for record in read_records(paths):
+        responses = {command: resp.encode('utf-8', 'surrogateescape') for command, resp in record["responses"].items()}
+        if teamspeak.server_data is None and "serverinfo" not in responses:
+            continue
+        if teamspeak.uses_server_groups and teamspeak.server_groups is None and "servergrouplist" not in responses:
+            continue
+        if "clientlist" not in responses:
+            continue
+
+        yield record["t"], teamspeak.parse_responses(responses, record["t"])
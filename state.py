@@ -0,0 +1,25 @@
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+def load_message_ids(path: str) -> dict:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read state file {path}: {e}")
+        return {}
+    return {int(channel_id): int(message_id) for channel_id, message_id in data.get('message_ids', {}).items()}
+
+
+def save_message_ids(path: str, message_ids: dict):
+    # Write to a temporary file first so a reader never sees a half written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'message_ids': {str(k): v for k, v in message_ids.items()}}, f)
+    os.replace(tmp_path, path)
@@ -1,54 +1,192 @@
 from datetime import datetime
 import logging
-from typing import Optional
+import socket
+import threading
+import time
+from typing import List, Optional
 from config import Config
+from ts3API import utilities
 from ts3API.TS3Connection import TS3Connection
 from ts3API.TS3Connection import TS3ConnectionClosedException
+from ts3API.TS3Connection import TS3QueryException
 
-from domain import ServerInfo
+from domain import ServerGroup, ServerInfo, parse_server_group_ids
+from recording import ResponseRecorder
 
 
 logger = logging.getLogger(__name__)
 
+# socket.setdefaulttimeout() is process wide, so connects in different threads mustn't interleave. Blocking
+# sockets other threads create meanwhile inherit the timeout too, the bot's own are asyncio or set their own
+DEFAULT_TIMEOUT_LOCK = threading.Lock()
+
 
 class Teamspeak:
     def __init__(self, config: Config):
         self.config = config
         self.ts_connection: Optional[TS3Connection] = None
+        # Bumped by abort(), so a connect that was given up on while running discards its connection
+        self.generation = 0
+        self.connection_lock = threading.Lock()
+        self.server_data: Optional[dict] = None
+        self.server_data_fetched_at: float = 0.0
+        self.server_groups: Optional[dict[int, ServerGroup]] = None
+        self.server_groups_fetched_at: float = 0.0
+        self.last_server_info: Optional[ServerInfo] = None
+        self.recorder: Optional[ResponseRecorder] = None
+        if config.record_file:
+            self.recorder = ResponseRecorder(config.record_file, config.record_max_bytes, config.record_backup_count)
 
     def connect(self):
+        # The server may have restarted in the meantime, so the cached serverinfo can't be trusted
+        self.server_data = None
+        self.server_groups = None
+        generation = self.generation
         try:
             if self.ts_connection:
                 self.ts_connection.quit()
+                self.ts_connection = None
 
-            query_port = self.config.ts3_query_port_ssh if self.config.use_ssh else self.config.ts3_query_port_telnet
-
-            self.ts_connection = TS3Connection(
-                host=self.config.ts3_host,
-                port=query_port,
-                use_ssh=self.config.use_ssh,
-                username=self.config.ts3_username,
-                password=self.config.ts3_password,
-                accept_all_keys=True  # maybe not safe, but w/e for this simple lil' bot
-            )
+            connection = self.open_connection()
+            with self.connection_lock:
+                if generation != self.generation:
+                    logger.warning("Connect to TeamSpeak server finished after it was aborted, discarding it")
+                    close_socket(connection)
+                    return
+                self.ts_connection = connection
 
-            self.ts_connection.login(self.config.ts3_username,
-                                     self.config.ts3_password)
-
-            self.ts_connection.use(self.config.ts3_virtual_server_id)
+            # Logging in after the connection is assigned lets abort() reach a server that stalls here
+            connection.login(self.config.ts3_username, self.config.ts3_password)
+            connection.use(self.config.ts3_virtual_server_id)
             logger.info("Connected to TeamSpeak server")
         except Exception as e:
             logger.error(f"Failed to connect to TeamSpeak server: {e}")
-            self.ts_connection = None
+            with self.connection_lock:
+                if generation == self.generation:
+                    self.ts_connection = None
 
-    def get_server_info(self) -> ServerInfo:
+    def open_connection(self) -> TS3Connection:
+        # ts3API connects and reads the banner without any timeout, so a server that accepts the
+        # connection and then stays silent would block forever. The timeout is only set while connecting,
+        # since the reader thread treats an idle socket that times out as a closed connection.
+        timeout = self.config.ts3_query_timeout
+        query_port = self.config.ts3_query_port_ssh if self.config.use_ssh else self.config.ts3_query_port_telnet
+        with DEFAULT_TIMEOUT_LOCK:
+            default_timeout = socket.getdefaulttimeout()
+            socket.setdefaulttimeout(timeout)
+            try:
+                if self.config.use_ssh:
+                    connection = TS3Connection(
+                        host=self.config.ts3_host,
+                        port=query_port,
+                        use_ssh=True,
+                        username=self.config.ts3_username,
+                        password=self.config.ts3_password,
+                        accept_all_keys=True,  # maybe not safe, but w/e for this simple lil' bot
+                        sshtimeout=timeout
+                    )
+                    connection._conn._channel.settimeout(None)
+                else:
+                    # Without credentials the constructor doesn't log in, connect() does that afterwards
+                    connection = TS3Connection(host=self.config.ts3_host, port=query_port)
+                    connection._conn._conn.settimeout(None)
+                    connection._conn.timeout = None
+            finally:
+                socket.setdefaulttimeout(default_timeout)
+        return connection
+
+    def query_batch(self, commands: List[tuple[str, List[str]]]) -> List[bytes]:
         assert self.ts_connection is not None, "No server connection."
 
-        server_info = self.ts_connection.serverinfo()
+        if self.config.ts3_pipeline_queries:
+            responses = send_pipelined(self.ts_connection, commands)
+        else:
+            responses = [self.ts_connection._send(command, args) for command, args in commands]
+
+        if self.recorder is not None:
+            try:
+                self.recorder.record({command: resp for (command, _), resp in zip(commands, responses)})
+            except OSError as e:
+                logger.error(f"Failed to record ServerQuery responses: {e}")
+
+        return responses
+
+    @property
+    def uses_server_groups(self) -> bool:
+        return bool(self.config.ts3_badge_server_groups or self.config.ts3_hidden_server_groups)
+
+    def get_server_info(self) -> ServerInfo:
+        now = time.monotonic()
+        commands = {}
+
+        # Name and max clients rarely change, so serverinfo is only refetched once its TTL runs out
+        if self.server_data is None or now - self.server_data_fetched_at >= self.config.ts3_serverinfo_ttl:
+            commands["serverinfo"] = []
+        if self.uses_server_groups and (
+                self.server_groups is None or now - self.server_groups_fetched_at >= self.config.ts3_servergroup_ttl):
+            commands["servergrouplist"] = []
+        commands["clientlist"] = ["-voice", "-times", "-groups"] if self.uses_server_groups else ["-voice", "-times"]
+
+        responses = dict(zip(commands, self.query_batch(list(commands.items()))))
+        return self.parse_responses(responses, now)
+
+    def parse_responses(self, responses: dict[str, bytes], now: float) -> ServerInfo:
+        # Also fed recorded responses by replay, so both apply the same caching, filtering and badges
+        if "serverinfo" in responses:
+            self.server_data = TS3Connection._parse_resp_to_dict(responses["serverinfo"])
+            self.server_data_fetched_at = now
+        if "servergrouplist" in responses:
+            self.server_groups = {
+                group.id: group for group in map(ServerGroup.from_serverquery_response,
+                                                 TS3Connection._parse_resp_to_list_of_dicts(responses["servergrouplist"]))}
+            self.server_groups_fetched_at = now
+
+        uptime = int(self.server_data.get('virtualserver_uptime', 0)) + int(now - self.server_data_fetched_at)
+        server_data = dict(self.server_data, virtualserver_uptime=uptime)
         online_clients = [
-            p for p in self.ts_connection.clientlist(params=['voice', 'times']) if p.get('client_type') == '0']
+            p for p in TS3Connection._parse_resp_to_list_of_dicts(responses["clientlist"]) if p.get('client_type') == '0']
+
+        badge_groups = None
+        if self.uses_server_groups:
+            online_clients = self.filter_hidden_clients(online_clients)
+            badge_groups = {id: self.server_groups[id] for id in self.config.ts3_badge_server_groups if id in self.server_groups}
+
+        self.last_server_info = ServerInfo.from_serverquery_response(server_data, online_clients, sampled_at=now, server_groups=badge_groups)
+        return self.last_server_info
+
+    def filter_hidden_clients(self, client_list: List[dict]) -> List[dict]:
+        hidden = set(self.config.ts3_hidden_server_groups)
+        visible = []
+        for client in client_list:
+            group_ids = parse_server_group_ids(client)
+            # A group missing from the index was created since it was fetched, refresh it on the next poll
+            if any(id not in self.server_groups for id in group_ids):
+                self.server_groups_fetched_at = 0.0
+            if not hidden.intersection(group_ids):
+                visible.append(client)
+        return visible
+
+    def poll(self) -> ServerInfo:
+        # Connects first when there is no connection, e.g. at startup or after abort()
+        if self.ts_connection is None:
+            self.connect()
+        return self.get_server_info()
+
+    def extrapolate_server_info(self) -> Optional[ServerInfo]:
+        # Advances uptime and idle times of the last poll without querying the server
+        if self.last_server_info is None:
+            return None
+        return self.last_server_info.advanced_to(time.monotonic())
 
-        return ServerInfo.from_serverquery_response(server_info, online_clients)
+    def abort(self):
+        # Drops a connection stuck mid-query or mid-connect
+        with self.connection_lock:
+            self.generation += 1
+            connection, self.ts_connection = self.ts_connection, None
+        self.server_data = None
+        self.server_groups = None
+        if connection is not None:
+            close_socket(connection)
 
     def close(self):
         if self.ts_connection:
@@ -57,3 +195,66 @@ class Teamspeak:
             except TS3ConnectionClosedException:
                 pass
             self.ts_connection = None
+        if self.recorder is not None:
+            self.recorder.close()
+
+
+def close_socket(connection: TS3Connection):
+    # quit() would wait for the lock a stuck query holds, so the socket is closed directly
+    # and the blocked reader is handed an error reply to raise
+    connection.stop_recv.set()
+    try:
+        # Closing alone doesn't wake a recv() blocked in the reader thread, a shutdown does, and the
+        # reader then closes the socket itself. Closing it here too could pull it from under that recv()
+        sock = getattr(connection._conn, "_conn", None)
+        if isinstance(sock, socket.socket):
+            sock.shutdown(socket.SHUT_RDWR)
+        else:
+            connection._conn.close()
+    except Exception as e:
+        logger.debug(f"Error closing aborted ServerQuery connection: {e}")
+    connection._data = [b"error", b"id=1", b"msg=connection\\saborted"]
+    connection._new_data.set()
+
+
+def send_pipelined(connection: TS3Connection, commands: List[tuple[str, List[str]]]) -> List[bytes]:
+    # TS3Connection._send does one round-trip per command. Here every command is written at once
+    # and the replies, each terminated by an "error" line, are matched back up in order.
+    query = b"".join(
+        (" ".join([command] + [utilities.escape(arg) for arg in args]) + "\n\r").encode()
+        for command, args in commands
+    )
+
+    responses = []
+    error = None
+    connection._conn_lock.acquire()
+    try:
+        connection._conn.write(query)
+        current = b""
+        while len(responses) < len(commands):
+            connection._new_data.wait()
+            if connection.stop_recv.is_set():
+                raise TS3ConnectionClosedException("Connection closed while waiting for a response")
+            resp = connection._data
+            connection._new_data.clear()
+            connection._data_read.set()
+            if resp is None:
+                continue
+
+            if resp[0] == b"error":
+                # Keep reading after a failed command so the following replies stay in sync
+                if resp[1] != b"id=0" and error is None:
+                    error = TS3QueryException(
+                        int(resp[1].decode(encoding="UTF-8").split("=", 1)[1]),
+                        resp[2].decode(encoding="UTF-8").split("=", 1)[1])
+                responses.append(current)
+                current = b""
+            else:
+                current += resp
+    finally:
+        if connection._conn_lock.locked():
+            connection._conn_lock.release()
+
+    if error is not None:
+        raise error
+    return responses
@@ -4,7 +4,7 @@ sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
 from config import Config
 from domain import ServerInfo, Client
-from image import generate_status_image
+from image import generate_status_image, generate_dashboard_image
 
 def save_test_image(server_info: ServerInfo, filename: str):
     result = generate_status_image(server_info, config=Config.from_env(), width=450)
@@ -28,6 +28,14 @@ def save_test_image(server_info: ServerInfo, filename: str):
     print(f"[OK] Generated: {filename}")
 
 
+def save_dashboard_image(server_infos: list, filename: str):
+    result = generate_dashboard_image(server_infos, config=Config.from_env(), columns=2, width=450)
+    with open(f"docs/{filename}", "wb") as f:
+        f.write(result.getvalue())
+
+    print(f"[OK] Generated: {filename}")
+
+
 def test_error_state():
     server_info = ServerInfo.from_error("Connection timed out")
     save_test_image(server_info, "test_output_error_state.png")
@@ -336,30 +344,139 @@ def test_different_error_messages():
         save_test_image(server_info, f"test_output_error_{idx+1}.png")
 
 
+def test_group_badges():
+    clients = [
+        Client(
+            nickname="ServerOwner",
+            type="0",
+            flag_talking=1,
+            input_muted=0,
+            output_muted=0,
+            idle_time=1000,
+            badges=["Admin"]
+        ),
+        Client(
+            nickname="RegularUser",
+            type="0",
+            flag_talking=0,
+            input_muted=0,
+            output_muted=0,
+            idle_time=90000,
+            badges=["Member", "Streamer"]
+        ),
+        Client(
+            nickname="Guest",
+            type="0",
+            flag_talking=0,
+            input_muted=0,
+            output_muted=1,
+            idle_time=400000
+        ),
+    ]
+
+    server_info = ServerInfo(
+        virtualserver_name="My TeamSpeak Server",
+        virtualserver_maxclients=32,
+        virtualserver_uptime=86400,
+        clients=clients,
+        error=None
+    )
+    save_test_image(server_info, "test_output_group_badges.png")
+
+
+def test_mixed_script_nicknames():
+    # The golden harness renders this with tools/fonts/DejaVuSans-Subset.ttf as the fallback, which covers
+    # the Cyrillic and the star but no CJK, so both the fallback runs and uncovered glyphs are pinned
+    clients = [
+        Client(
+            nickname="Иван Петров",
+            type="0",
+            flag_talking=1,
+            input_muted=0,
+            output_muted=0,
+            idle_time=1000
+        ),
+        Client(
+            nickname="田中 太郎",
+            type="0",
+            flag_talking=0,
+            input_muted=0,
+            output_muted=0,
+            idle_time=90000
+        ),
+        Client(
+            nickname="José ★ Müller",
+            type="0",
+            flag_talking=0,
+            input_muted=1,
+            output_muted=0,
+            idle_time=5000,
+            badges=["Модератор"]
+        ),
+    ]
+
+    server_info = ServerInfo(
+        virtualserver_name="Сервер 服务器",
+        virtualserver_maxclients=32,
+        virtualserver_uptime=86400,
+        clients=clients,
+        error=None
+    )
+    save_test_image(server_info, "test_output_mixed_script_nicknames.png")
+
+
+def test_dashboard():
+    server_infos = [
+        ServerInfo(
+            virtualserver_name="Main Server",
+            virtualserver_maxclients=32,
+            virtualserver_uptime=86400 * 3,
+            clients=[
+                Client(nickname="TalkingUser", type="0", flag_talking=1, input_muted=0, output_muted=0, idle_time=2000),
+                Client(nickname="MicMutedUser", type="0", flag_talking=0, input_muted=1, output_muted=0, idle_time=180000),
+            ],
+            error=None
+        ),
+        ServerInfo(
+            virtualserver_name="Event Server",
+            virtualserver_maxclients=64,
+            virtualserver_uptime=3600,
+            clients=[],
+            error=None
+        ),
+        ServerInfo.from_error("Connection refused"),
+    ]
+    save_dashboard_image(server_infos, "test_output_dashboard.png")
+
+
+TEST_CASES = [
+    ("Error State", test_error_state),
+    ("No Users Online", test_no_users_online),
+    ("Single User - Normal", test_single_user_normal),
+    ("Single User - Talking", test_single_user_talking),
+    ("Single User - Input Muted", test_single_user_input_muted),
+    ("Single User - Output Muted", test_single_user_output_muted),
+    ("Multiple Users - Mixed States", test_multiple_users_mixed_states),
+    ("Many Users", test_many_users),
+    ("Long Idle Times", test_long_idle_times),
+    ("Short Idle Times", test_short_idle_times),
+    ("Long Server Name", test_long_server_name),
+    ("Long Username", test_long_username),
+    ("Max Capacity", test_max_capacity),
+    ("Different Error Messages", test_different_error_messages),
+    ("Group Badges", test_group_badges),
+    ("Mixed Script Nicknames", test_mixed_script_nicknames),
+    ("Dashboard", test_dashboard),
+]
+
+
 def main():
     print("=" * 60)
     print("Generating test images for discord-ts3-status bot")
     print("=" * 60)
     print()
     
-    test_cases = [
-        ("Error State", test_error_state),
-        ("No Users Online", test_no_users_online),
-        ("Single User - Normal", test_single_user_normal),
-        ("Single User - Talking", test_single_user_talking),
-        ("Single User - Input Muted", test_single_user_input_muted),
-        ("Single User - Output Muted", test_single_user_output_muted),
-        ("Multiple Users - Mixed States", test_multiple_users_mixed_states),
-        ("Many Users", test_many_users),
-        ("Long Idle Times", test_long_idle_times),
-        ("Short Idle Times", test_short_idle_times),
-        ("Long Server Name", test_long_server_name),
-        ("Long Username", test_long_username),
-        ("Max Capacity", test_max_capacity),
-        ("Different Error Messages", test_different_error_messages),
-    ]
-    
-    for test_name, test_func in test_cases:
+    for test_name, test_func in TEST_CASES:
         print(f"Running: {test_name}")
         try:
             test_func()
@@ -0,0 +1,142 @@
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from PIL import Image, ImageChops
+
+import generate_test_images
+from config import Config
+from image import DASHBOARD_PANEL_CACHE, DASHBOARD_PANEL_CACHE_LOCK, generate_status_image, generate_dashboard_image
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "goldens"
+# Covers the Cyrillic and symbols of the mixed script scenario, so the goldens pin the fallback path
+FALLBACK_FONT = Path(__file__).resolve().parent / "fonts" / "DejaVuSans-Subset.ttf"
+# Fixed so the footer renders the same on every run
+TIMESTAMP = datetime(2024, 1, 1, 12, 0, 0)
+
+
+def collect_scenarios() -> list:
+    # Runs the generate_test_images scenarios with their save functions swapped for collectors
+    scenarios = []
+    save_test_image = generate_test_images.save_test_image
+    save_dashboard_image = generate_test_images.save_dashboard_image
+    generate_test_images.save_test_image = lambda server_info, filename: scenarios.append(
+        (filename, lambda config: generate_status_image(server_info, config, width=450, timestamp=TIMESTAMP)))
+    generate_test_images.save_dashboard_image = lambda server_infos, filename: scenarios.append(
+        (filename, lambda config: generate_dashboard_image(server_infos, config, columns=2, width=450, timestamp=TIMESTAMP)))
+    try:
+        for _, test_func in generate_test_images.TEST_CASES:
+            test_func()
+    finally:
+        generate_test_images.save_test_image = save_test_image
+        generate_test_images.save_dashboard_image = save_dashboard_image
+    return scenarios
+
+
+def render(render_func, config: Config, repeat: int) -> tuple[bytes, list]:
+    timings = []
+    for _ in range(repeat):
+        # Panels cached by the previous repeat would turn the dashboard timings into cache hits
+        with DASHBOARD_PANEL_CACHE_LOCK:
+            DASHBOARD_PANEL_CACHE.clear()
+        started = time.perf_counter()
+        result = render_func(config).getvalue()
+        timings.append(time.perf_counter() - started)
+    return result, timings
+
+
+def compare(expected: Image.Image, actual: Image.Image, tolerance: int) -> tuple[int, Image.Image | None]:
+    if expected.size != actual.size:
+        return -1, None
+
+    # A pixel differs when any channel is off by more than the tolerance
+    diff = ImageChops.difference(expected, actual)
+    mask = Image.new("L", diff.size, 0)
+    for band in diff.split():
+        mask = ImageChops.lighter(mask, band.point(lambda v: 255 if v > tolerance else 0))
+    return sum(1 for v in mask.getdata() if v), mask
+
+
+def save_diff(path: Path, expected: Image.Image, actual: Image.Image, mask: Image.Image | None):
+    width = expected.width + actual.width + (mask.width if mask else 0)
+    height = max(expected.height, actual.height)
+    sheet = Image.new("RGBA", (width, height), (255, 0, 255, 255))
+    sheet.paste(expected, (0, 0))
+    sheet.paste(actual, (expected.width, 0))
+    if mask is not None:
+        highlight = actual.copy()
+        highlight.paste((255, 0, 0, 255), (0, 0), mask)
+        sheet.paste(highlight, (expected.width + actual.width, 0))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    sheet.save(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare rendered status images against committed goldens")
+    parser.add_argument("--update", action="store_true", help="overwrite the goldens with the current renders")
+    parser.add_argument("--tolerance", type=int, default=0, help="per-channel difference still counted as equal")
+    parser.add_argument("--max-diff-pixels", type=int, default=0, help="differing pixels allowed per image")
+    parser.add_argument("--diff-dir", type=Path, default=GOLDEN_DIR / "diff")
+    parser.add_argument("--repeat", type=int, default=5, help="renders per scenario for the timings")
+    parser.add_argument("--timings", type=Path, help="write per-scenario render timings to this JSON file")
+    args = parser.parse_args()
+
+    config = Config.from_env({"FALLBACK_FONTS": str(FALLBACK_FONT)})
+    failures = []
+    timings = {}
+
+    print(f"{'scenario':<48} {'result':<10} {'median':>9} {'min':>9}")
+    for filename, render_func in collect_scenarios():
+        result, scenario_timings = render(render_func, config, args.repeat)
+        timings[filename] = {
+            "median_ms": statistics.median(scenario_timings) * 1000,
+            "min_ms": min(scenario_timings) * 1000,
+        }
+
+        golden_path = GOLDEN_DIR / filename
+        if args.update:
+            GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+            golden_path.write_bytes(result)
+            status = "updated"
+        elif not golden_path.exists():
+            failures.append(f"{filename}: no golden, run with --update")
+            status = "missing"
+        else:
+            expected = Image.open(golden_path).convert("RGBA")
+            actual = Image.open(io.BytesIO(result)).convert("RGBA")
+            diff_pixels, mask = compare(expected, actual, args.tolerance)
+            if diff_pixels == -1:
+                failures.append(f"{filename}: size {actual.size} != golden {expected.size}")
+                save_diff(args.diff_dir / filename, expected, actual, None)
+                status = "size"
+            elif diff_pixels > args.max_diff_pixels:
+                failures.append(f"{filename}: {diff_pixels} pixels differ")
+                save_diff(args.diff_dir / filename, expected, actual, mask)
+                status = "differs"
+            else:
+                status = "ok"
+
+        print(f"{filename:<48} {status:<10} {timings[filename]['median_ms']:>7.2f}ms {timings[filename]['min_ms']:>7.2f}ms")
+
+    if args.timings:
+        args.timings.write_text(json.dumps(timings, indent=2))
+
+    print()
+    if failures:
+        for failure in failures:
+            print(f"[FAIL] {failure}")
+        if args.diff_dir.exists():
+            print(f"Diff images written to {args.diff_dir}")
+        sys.exit(1)
+    print("[OK] All renders match their goldens")
+
+
+if __name__ == "__main__":
+    main()
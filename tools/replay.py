@@ -0,0 +1,72 @@
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bot import Bot
+from config import Config
+from recording import replay_server_infos
+
+
+def print_timings(name: str, timings: list):
+    if not timings:
+        return
+    timings = sorted(timings)
+    p95 = timings[min(int(len(timings) * 0.95), len(timings) - 1)]
+    print(f"{name:<8} n={len(timings):<6} mean={statistics.mean(timings) * 1000:7.2f}ms  "
+          f"p50={statistics.median(timings) * 1000:7.2f}ms  p95={p95 * 1000:7.2f}ms  max={timings[-1] * 1000:7.2f}ms")
+
+
+async def replay(args):
+    bot = Bot(Config.load())
+
+    parse_timings = []
+    render_timings = []
+    first_recorded_at = None
+    started_at = time.monotonic()
+
+    records = iter(replay_server_infos(args.files, bot.teamspeak))
+    while True:
+        parse_started = time.perf_counter()
+        try:
+            recorded_at, server_info = next(records)
+        except StopIteration:
+            break
+        parse_timings.append(time.perf_counter() - parse_started)
+
+        if args.speed > 0:
+            if first_recorded_at is None:
+                first_recorded_at = recorded_at
+            delay = (recorded_at - first_recorded_at) / args.speed - (time.monotonic() - started_at)
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        render_started = time.perf_counter()
+        bot.create_embed(server_info)
+        render_timings.append(time.perf_counter() - render_started)
+
+        if args.verbose:
+            print(f"{recorded_at:.3f} {server_info.name}: {server_info.online_users_count}/{server_info.max_clients}")
+
+    elapsed = time.monotonic() - started_at
+    print(f"Replayed {len(render_timings)} polls in {elapsed:.2f}s")
+    print_timings("parse", parse_timings)
+    print_timings("render", render_timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded ServerQuery responses through parsing and rendering")
+    parser.add_argument("files", nargs="+", help="recordings in chronological order, e.g. rec.jsonl.gz.2 rec.jsonl.gz.1 rec.jsonl.gz")
+    parser.add_argument("--speed", type=float, default=0,
+                        help="playback speed relative to the recording (1 = recorded speed, 0 = as fast as possible)")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import random
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+from types import SimpleNamespace
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import discord
+from ts3API.TS3Connection import TS3ConnectionClosedException
+
+from bot import Bot
+from config import Config
+from http_server import SnapshotServer
+from teamspeak import Teamspeak
+
+NICKNAMES = ["Alice", "Bob", "Charlie", "Dave", "Eve", "Mallory", "Trent", "Peggy", "Victor", "Walter"]
+
+
+class FakeTeamspeak(Teamspeak):
+    # Answers query_batch with generated raw ServerQuery responses, so parsing and caching run for real
+    def __init__(self, config: Config, failure_rate: float):
+        super().__init__(config)
+        self.failure_rate = failure_rate
+        self.connects = 0
+        self.uptime = 3600
+
+    def connect(self):
+        self.server_data = None
+        self.ts_connection = object()
+        self.connects += 1
+
+    def abort(self):
+        self.ts_connection = None
+
+    def query_batch(self, commands):
+        if random.random() < self.failure_rate:
+            raise TS3ConnectionClosedException("Simulated connection loss")
+
+        self.uptime += 1
+        responses = []
+        for command, _ in commands:
+            if command == "serverinfo":
+                responses.append(
+                    f"virtualserver_name=Soak\\sTest virtualserver_maxclients=32 virtualserver_uptime={self.uptime}".encode())
+            elif command == "clientlist":
+                clients = [
+                    f"clid={i} client_nickname={random.choice(NICKNAMES)}{random.randint(0, 99999)} client_type=0 "
+                    f"client_idle_time={random.randint(0, 900000)} client_flag_talking={random.randint(0, 1)} "
+                    f"client_input_muted={random.randint(0, 1)} client_output_muted={random.randint(0, 1)}"
+                    for i in range(random.randint(0, 12))
+                ]
+                clients.append("clid=999 client_nickname=serveradmin client_type=1")
+                responses.append("|".join(clients).encode())
+            else:
+                responses.append(b"")
+        return responses
+
+    def close(self):
+        pass
+
+
+class FakeMessage:
+    def __init__(self, id: int):
+        self.id = id
+
+    async def edit(self, embed=None, attachments=None):
+        # Consume the uploads the way discord.py does
+        for file in attachments or []:
+            file.fp.read()
+            file.close()
+
+
+class FakeChannel:
+    def __init__(self, id: int, missing_rate: float):
+        self.id = id
+        self.type = discord.ChannelType.text
+        self.missing_rate = missing_rate
+        self.messages: dict = {}
+        self.next_message_id = 1
+
+    async def fetch_message(self, id: int) -> FakeMessage:
+        if random.random() < self.missing_rate or id not in self.messages:
+            self.messages.pop(id, None)
+            raise discord.NotFound(SimpleNamespace(status=404, reason="Not Found"), "Unknown Message")
+        return self.messages[id]
+
+    async def send(self, embed=None, file=None) -> FakeMessage:
+        if file is not None:
+            file.fp.read()
+            file.close()
+        message = FakeMessage(self.next_message_id)
+        self.next_message_id += 1
+        self.messages = {message.id: message}
+        return message
+
+    async def purge(self, limit=100, check=None):
+        self.messages.clear()
+
+
+class FakeVoiceChannel:
+    def __init__(self, id: int):
+        self.id = id
+        self.type = discord.ChannelType.voice
+        self.name = ""
+
+    async def edit(self, name=None):
+        self.name = name
+
+
+def count_open_fds() -> int | None:
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def count_objects() -> Counter:
+    gc.collect()
+    return Counter(type(o).__name__ for o in gc.get_objects())
+
+
+def take_sample(cycle: int) -> dict:
+    gc.collect()
+    return {
+        "cycle": cycle,
+        "memory": tracemalloc.get_traced_memory()[0],
+        "fds": count_open_fds(),
+        "threads": threading.active_count(),
+    }
+
+
+def print_sample(sample: dict, baseline: dict):
+    fds = f"{sample['fds']} ({sample['fds'] - baseline['fds']:+d})" if sample["fds"] is not None else "n/a"
+    print(f"cycle {sample['cycle']:>7}  memory {sample['memory'] / 1024:>9.1f} KiB "
+          f"({(sample['memory'] - baseline['memory']) / 1024:+.1f})  fds {fds}  threads {sample['threads']}")
+
+
+def create_bot(args) -> Bot:
+    channel_ids = list(range(1, args.channels + 1))
+    profiles = {id: {"language": "cs"} for id in channel_ids[::2]}
+    profiles.update({id: {"use_image_embed": False} for id in channel_ids[::3]})
+    config = Config(
+        discord_token="",
+        discord_channel_ids=channel_ids,
+        discord_voice_channel_ids=[1000],
+        ts3_host="127.0.0.1",
+        timezone="Europe/London",
+        ts3_serverinfo_ttl=args.serverinfo_ttl,
+        channel_profiles=profiles,
+    )
+
+    bot = Bot(config)
+    bot.teamspeak = FakeTeamspeak(config, args.failure_rate)
+    bot.snapshot_server = SnapshotServer("127.0.0.1", 0)
+
+    channels = {id: FakeChannel(id, args.missing_rate) for id in channel_ids}
+    channels[1000] = FakeVoiceChannel(1000)
+    bot.bot.get_channel = channels.get
+    return bot
+
+
+async def run(args) -> bool:
+    bot = create_bot(args)
+
+    for _ in range(args.warmup):
+        await bot.update_status()
+
+    tracemalloc.start(args.trace_depth)
+    baseline = take_sample(args.warmup)
+    baseline_snapshot = tracemalloc.take_snapshot()
+    baseline_objects = count_objects()
+    print_sample(baseline, baseline)
+
+    samples = [baseline]
+    for cycle in range(1, args.cycles + 1):
+        await bot.update_status()
+        if cycle % args.report_every == 0:
+            samples.append(take_sample(args.warmup + cycle))
+            print_sample(samples[-1], baseline)
+
+    final = samples[-1]
+    midpoint = samples[len(samples) // 2]
+    snapshot = tracemalloc.take_snapshot()
+    objects = count_objects()
+    tracemalloc.stop()
+
+    print()
+    print("Top allocation growth since baseline:")
+    for stat in snapshot.compare_to(baseline_snapshot, "lineno")[:args.top]:
+        print(f"  {stat}")
+
+    print()
+    print("Top object count growth since baseline:")
+    for name, count in (objects - baseline_objects).most_common(args.top):
+        print(f"  {name}: +{count}")
+
+    print()
+    print(f"TeamSpeak reconnects: {bot.teamspeak.connects}")
+
+    # A leak keeps growing past the midpoint, a warming cache levels off before it
+    memory_growth = final["memory"] - baseline["memory"]
+    leaks = []
+    if memory_growth > args.max_memory_growth * 1024 and final["memory"] > midpoint["memory"]:
+        leaks.append(f"memory grew by {memory_growth / 1024:.1f} KiB and was still growing")
+    if final["fds"] is not None and final["fds"] - baseline["fds"] > args.max_fd_growth:
+        leaks.append(f"open file descriptors grew by {final['fds'] - baseline['fds']}")
+    if final["threads"] - baseline["threads"] > args.max_thread_growth:
+        leaks.append(f"threads grew by {final['threads'] - baseline['threads']}")
+
+    print()
+    if leaks:
+        for leak in leaks:
+            print(f"[FAIL] {leak}")
+        return False
+    print("[OK] No unbounded growth detected")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Drive many update_status cycles against local fakes and check for leaks")
+    parser.add_argument("--cycles", type=int, default=5000)
+    parser.add_argument("--warmup", type=int, default=200, help="cycles run before the baseline is taken")
+    parser.add_argument("--report-every", type=int, default=500)
+    parser.add_argument("--channels", type=int, default=6)
+    parser.add_argument("--failure-rate", type=float, default=0.02, help="share of polls failing with a lost connection")
+    parser.add_argument("--missing-rate", type=float, default=0.01, help="share of message fetches answered with NotFound")
+    parser.add_argument("--serverinfo-ttl", type=int, default=0)
+    parser.add_argument("--max-memory-growth", type=int, default=2048, help="KiB")
+    parser.add_argument("--max-fd-growth", type=int, default=2)
+    parser.add_argument("--max-thread-growth", type=int, default=2)
+    parser.add_argument("--trace-depth", type=int, default=1)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    sys.exit(0 if asyncio.run(run(args)) else 1)
+
+
+if __name__ == "__main__":
+    main()
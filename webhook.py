@@ -0,0 +1,46 @@
+import logging
+from typing import List, Optional
+
+import aiohttp
+import discord
+
+logger = logging.getLogger(__name__)
+
+WEBHOOK_CONNECTION_LIMIT = 10
+
+
+class WebhookChannel:
+    # Covers the parts of discord.TextChannel that Bot.update_status uses
+    def __init__(self, webhook: discord.Webhook):
+        self.webhook = webhook
+        self.id = webhook.id
+
+    async def fetch_message(self, id: int) -> discord.WebhookMessage:
+        return await self.webhook.fetch_message(id)
+
+    async def send(self, embed: discord.Embed, file: Optional[discord.File] = None) -> discord.WebhookMessage:
+        if file is None:
+            return await self.webhook.send(embed=embed, wait=True)
+        return await self.webhook.send(embed=embed, file=file, wait=True)
+
+    async def purge(self, limit=100, check=None):
+        # Webhooks can't list channel messages, earlier posts are only found again through STATE_FILE
+        pass
+
+
+class WebhookPool:
+    # All webhooks share one pooled HTTP session and no gateway connection is ever opened
+    def __init__(self, urls: List[str]):
+        self.urls = urls
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.channels: List[WebhookChannel] = []
+
+    async def start(self):
+        self.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=WEBHOOK_CONNECTION_LIMIT))
+        self.channels = [WebhookChannel(discord.Webhook.from_url(url, session=self.session)) for url in self.urls]
+        logger.info(f"Posting through {len(self.channels)} webhook(s)")
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None